@@ -8,9 +8,10 @@ then uses FFmpeg to extract those segments and combine them into a new audio fil
 import os
 import json
 import argparse
+import hashlib
 import subprocess
-import tempfile
-from typing import List, Dict, Any
+import numpy as np
+from typing import List, Dict, Any, Optional
 
 def load_segments(json_file_path: str) -> List[Dict[str, Any]]:
     """
@@ -33,6 +34,8 @@ def load_segments(json_file_path: str) -> List[Dict[str, Any]]:
 def merge_close_segments(segments: List[Dict[str, Any]], threshold: float = 0.5) -> List[Dict[str, Any]]:
     """
     Merge consecutive segments that are very close together into a single segment.
+    Durations of the returned segments are rounded to milliseconds, and each
+    returned segment also carries its end time ("end") on the same grid.
     
     Args:
         segments: List of segments to process
@@ -41,43 +44,167 @@ def merge_close_segments(segments: List[Dict[str, Any]], threshold: float = 0.5)
     Returns:
         List of merged segments
     """
-    if not segments or len(segments) < 2:
+    if not segments:
         return segments
     
-    merged_segments = []
-    current_segment = segments[0].copy()
+    starts = np.fromiter((segment["start"] for segment in segments), dtype=np.float64, count=len(segments))
+    durations = np.fromiter((segment["duration"] for segment in segments), dtype=np.float64, count=len(segments))
+    ends = starts + durations
     
-    for next_segment in segments[1:]:
-        # Calculate the gap between the end of current segment and start of next segment
-        current_end = current_segment["start"] + current_segment["duration"]
-        gap = next_segment["start"] - current_end
-        
-        if 0 <= gap <= threshold:
+    # A segment starts a new group when it overlaps or is too far from the previous one
+    gaps = starts[1:] - ends[:-1]
+    breaks = np.flatnonzero((gaps < 0) | (gaps > threshold)) + 1
+    
+    firsts = np.concatenate(([0], breaks))
+    lasts = np.concatenate((breaks - 1, [len(segments) - 1]))
+    # Round durations and end times to milliseconds in one vectorized pass
+    merged_durations = np.round(ends[lasts] - starts[firsts], 3)
+    merged_ends = np.round(starts[firsts] + merged_durations, 3)
+    
+    merged_segments = []
+    for first, last, duration, end in zip(firsts, lasts, merged_durations.tolist(), merged_ends.tolist()):
+        current_segment = segments[first].copy()
+        current_segment["duration"] = duration
+        current_segment["end"] = end
+        if last > first:
             # Merge segments
-            new_duration = (next_segment["start"] + next_segment["duration"]) - current_segment["start"]
-            current_segment["duration"] = new_duration
-            current_segment["text"] = f"{current_segment['text']} {next_segment['text']}"
+            current_segment["text"] = " ".join(segments[j]["text"] for j in range(first, last + 1))
             # If there are other properties like "person", you might want to handle them here
-        else:
-            # Add the current segment to results and start a new one
-            merged_segments.append(current_segment)
-            current_segment = next_segment.copy()
-    
-    # Add the last segment
-    merged_segments.append(current_segment)
+        merged_segments.append(current_segment)
     
     print(f"Merged {len(segments)} segments into {len(merged_segments)} segments")
     return merged_segments
 
-def create_fake_audio(audio_file: str, segments: List[Dict[str, Any]], output_file: str, merge_threshold: float = 0.5) -> bool:
+def build_filter_command(audio_file: str, segments: List[Dict[str, Any]], output_file: str) -> List[str]:
+    """
+    Build a single FFmpeg command that opens every segment as its own input and
+    concatenates them with a filter graph (re-encodes the output).
+    
+    Each input is seeked with -ss placed before -i, so FFmpeg jumps straight to
+    the segment instead of decoding the file from the beginning. Because the
+    audio is decoded, the cut is still sample accurate.
+    
+    Args:
+        audio_file: Path to the original audio file
+        segments: List of segments to extract and combine
+        output_file: Path to save the resulting audio file
+        
+    Returns:
+        FFmpeg command as a list of arguments
+    """
+    cmd = [
+        "ffmpeg",
+        "-y",  # Overwrite output files without asking
+        "-loglevel", "error",  # Only report errors on stderr
+        "-nostdin",  # Never wait for keyboard input
+    ]
+    for segment in segments:
+        cmd += [
+            "-ss", str(segment["start"]),  # Seek on the input
+            "-t", str(segment["duration"]),  # Duration
+            "-i", audio_file,  # Input file
+        ]
+    
+    labels = "".join(f"[{i}:a]" for i in range(len(segments)))
+    cmd += [
+        "-filter_complex", f"{labels}concat=n={len(segments)}:v=0:a=1[out]",  # Join all inputs
+        "-map", "[out]",  # Write the concatenated stream
+        output_file  # Output file
+    ]
+    return cmd
+
+def build_concat_list(audio_file: str, segments: List[Dict[str, Any]]) -> str:
+    """
+    Build a concat demuxer script that cuts every segment out of the original
+    audio with inpoint/outpoint directives, so the segments can be copied
+    without re-encoding.
+    
+    The demuxer seeks the input to each inpoint, but a stream copy can only cut
+    on packet boundaries, so segment edges may snap to the nearest MP3 frame
+    (~26 ms). Use the re-encoding path when exact cuts matter.
+    
+    Args:
+        audio_file: Path to the original audio file
+        segments: Segments to extract and combine, as returned by merge_close_segments
+        
+    Returns:
+        Contents of the concat script
+    """
+    # The script is read from stdin, so reference the audio by absolute path
+    escaped_path = os.path.abspath(audio_file).replace("'", "'\\''")
+    lines = ["ffconcat version 1.0"]
+    for segment in segments:
+        lines.append(f"file '{escaped_path}'")
+        lines.append(f"inpoint {segment['start']}")
+        lines.append(f"outpoint {segment['end']}")
+    return "\n".join(lines) + "\n"
+
+def build_cut_command(audio_file: str, segment: Dict[str, Any], output_file: str) -> List[str]:
+    """
+    Build an FFmpeg command that copies a single segment straight to the output.
+    
+    Args:
+        audio_file: Path to the original audio file
+        segment: Segment to extract
+        output_file: Path to save the resulting audio file
+        
+    Returns:
+        FFmpeg command as a list of arguments
+    """
+    return [
+        "ffmpeg",
+        "-y",  # Overwrite output files without asking
+        "-loglevel", "error",  # Only report errors on stderr
+        "-nostdin",  # Never wait for keyboard input
+        "-ss", str(segment["start"]),  # Seek on the input
+        "-i", audio_file,  # Input file
+        "-t", str(segment["duration"]),  # Duration
+        "-c:a", "copy",  # Copy audio codec (no re-encoding)
+        output_file  # Output file
+    ]
+
+def compute_signature(audio_file: str, segments: List[Dict[str, Any]], merge_threshold: float,
+                      reencode: bool) -> Optional[str]:
+    """
+    Compute a signature of everything that determines the fake audio output.
+    
+    Args:
+        audio_file: Path to the original audio file
+        segments: List of segments to extract and combine
+        merge_threshold: Maximum time gap (in seconds) between segments to be merged
+        reencode: Whether the output is re-encoded
+        
+    Returns:
+        Hex digest of the inputs, or None if the audio file cannot be read
+    """
+    try:
+        stat = os.stat(audio_file)
+    except OSError:
+        return None
+    inputs = {
+        "audio_file": os.path.abspath(audio_file),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "segments": segments,
+        "merge_threshold": merge_threshold,
+        "reencode": reencode,
+    }
+    return hashlib.blake2b(json.dumps(inputs, sort_keys=True).encode("utf-8"), digest_size=16).hexdigest()
+
+def create_fake_audio(audio_file: str, segments: List[Dict[str, Any]], output_file: str, merge_threshold: float = 0.5,
+                      reencode: bool = False, force: bool = False) -> bool:
     """
     Create a fake audio file by extracting and combining segments from the original audio.
+    All segments are cut and joined by a single FFmpeg process. A signature of the
+    inputs is stored next to the output, so an up-to-date output is not rebuilt.
     
     Args:
         audio_file: Path to the original audio file
         segments: List of segments to extract and combine
         output_file: Path to save the resulting audio file
         merge_threshold: Maximum time gap (in seconds) between segments to be merged
+        reencode: Trim with a filter graph and re-encode instead of copying the audio stream
+        force: Rebuild the output even if it is up to date
         
     Returns:
         True if successful, False otherwise
@@ -86,73 +213,73 @@ def create_fake_audio(audio_file: str, segments: List[Dict[str, Any]], output_fi
         print("No segments provided.")
         return False
     
+    # Skip the work if the output was already built from the same inputs
+    signature = compute_signature(audio_file, segments, merge_threshold, reencode)
+    signature_file = f"{output_file}.sig"
+    if signature and not force and os.path.exists(output_file):
+        try:
+            with open(signature_file, "r") as f:
+                if f.read().strip() == signature:
+                    print(f"Fake audio is up to date: {output_file}")
+                    return True
+        except OSError:
+            pass
+    
     # Merge segments that are close together
-    # print(segments)
-    merged_segments = merge_close_segments(segments, merge_threshold)    
-    # print(merged_segments)
+    merged_segments = merge_close_segments(segments, merge_threshold)
 
-    # Create a temporary directory to store segment files
-    with tempfile.TemporaryDirectory() as temp_dir:
-        segment_files = []
-        
-        # Extract each segment to a separate file
-        for i, segment in enumerate(merged_segments):
-            start_time = segment["start"]
-            duration = round(segment["duration"], 3)
-            segment_file = os.path.join(temp_dir, f"segment_{i:03d}.mp3")
-            
-            # Use FFmpeg to extract the segment
-            cmd = [
-                "ffmpeg",
-                "-y",  # Overwrite output files without asking
-                "-i", audio_file,  # Input file
-                "-ss", str(start_time),  # Start time
-                "-t", str(duration),  # Duration
-                "-c:a", "copy",  # Copy audio codec (no re-encoding)
-                segment_file  # Output file
-            ]
-            
-            try:
-                print(f"Extracting segment {i+1}/{len(merged_segments)}: {segment['text']} [{start_time} : {duration}]")
-                subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                segment_files.append(segment_file)
-            except subprocess.CalledProcessError as e:
-                print(f"Error extracting segment {i+1}: {e}")
-                print(f"FFmpeg stderr: {e.stderr.decode('utf-8')}")
-                return False
-        
-        # Create a file list for FFmpeg to concatenate
-        concat_file = os.path.join(temp_dir, "concat_list.txt")
-        with open(concat_file, "w") as f:
-            for segment_file in segment_files:
-                f.write(f"file '{segment_file}'\n")
-        
-        # Concatenate all segments
-        concat_cmd = [
+    for i, segment in enumerate(merged_segments):
+        print(f"Segment {i+1}/{len(merged_segments)}: {segment['text']} [{segment['start']} : {segment['duration']}]")
+
+    if len(merged_segments) == 1 and not reencode:
+        # A single segment can be copied straight to the output
+        cmd = build_cut_command(audio_file, merged_segments[0], output_file)
+        concat_list = None
+    elif reencode:
+        cmd = build_filter_command(audio_file, merged_segments, output_file)
+        concat_list = None
+    else:
+        # Feed the concat script through stdin, copying codecs (no re-encoding)
+        cmd = [
             "ffmpeg",
             "-y",  # Overwrite output files without asking
+            "-loglevel", "error",  # Only report errors on stderr
             "-f", "concat",  # Use concat demuxer
-            "-safe", "0",  # Don't require safe filenames
-            "-i", concat_file,  # Input file list
+            "-safe", "0",  # Allow absolute file paths
+            "-protocol_whitelist", "file,pipe",  # Read the script from stdin
+            "-i", "pipe:0",  # Input file list
             "-c", "copy",  # Copy codecs (no re-encoding)
+            "-avoid_negative_ts", "make_zero",  # Shift packets kept from before an inpoint
             output_file  # Output file
         ]
+        concat_list = build_concat_list(audio_file, merged_segments).encode("utf-8")
+    
+    # Invalidate any previous signature before the output is overwritten
+    if os.path.exists(signature_file):
+        os.remove(signature_file)
+    
+    try:
+        print(f"Combining segments into {output_file}...")
+        subprocess.run(cmd, input=concat_list, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        print(f"Fake audio created successfully: {output_file}")
         
-        try:
-            print(f"Combining segments into {output_file}...")
-            subprocess.run(concat_cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            print(f"Fake audio created successfully: {output_file}")
-            
-            # Print the fake narrative
-            print("\nFake narrative:")
-            narrative = " ".join([segment["text"] for segment in merged_segments])
-            print(f'"{narrative}"')
-            
-            return True
-        except subprocess.CalledProcessError as e:
-            print(f"Error combining segments: {e}")
-            print(f"FFmpeg stderr: {e.stderr.decode('utf-8')}")
-            return False
+        if signature:
+            try:
+                with open(signature_file, "w") as f:
+                    f.write(signature)
+            except OSError as e:
+                print(f"Warning: Could not write signature file: {e}")
+        
+        # Print the fake narrative
+        print("\nFake narrative:")
+        narrative = " ".join([segment["text"] for segment in merged_segments])
+        print(f'"{narrative}"')
+        
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"Error combining segments: {e}")
+        print(f"FFmpeg stderr: {e.stderr.decode('utf-8')}")
+        return False
 
 def main():
     """Main function to parse arguments and create fake audio."""
@@ -163,6 +290,10 @@ def main():
                         help="Output audio file (default: <json_file_base>_fake.mp3)")
     parser.add_argument("-t", "--threshold", type=float, default=0.5,
                         help="Maximum time gap (in seconds) between segments to be merged (default: 0.5)")
+    parser.add_argument("--reencode", action="store_true",
+                        help="Trim with an FFmpeg filter graph and re-encode instead of copying the audio stream")
+    parser.add_argument("--force", action="store_true",
+                        help="Rebuild the fake audio even if it is up to date")
     
     args = parser.parse_args()
     
@@ -178,7 +309,7 @@ def main():
         return
     
     # Create fake audio
-    create_fake_audio(args.audio_file, segments, args.output, args.threshold)
+    create_fake_audio(args.audio_file, segments, args.output, args.threshold, args.reencode, args.force)
 
 if __name__ == "__main__":
     main()
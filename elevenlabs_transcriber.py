@@ -6,9 +6,22 @@ This script transcribes audio files using the ElevenLabs Speech-to-Text API.
 
 import os
 import json
+import math
+import glob
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from requests_toolbelt.multipart.encoder import MultipartEncoder
 from dotenv import load_dotenv
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator
+
+try:
+    import ijson
+except ImportError:  # Optional: parse the whole response at once instead of streaming it
+    ijson = None
 
 # Load environment variables from .env file
 load_dotenv()
@@ -21,6 +34,28 @@ if not ELEVENLABS_API_KEY:
 # API endpoint for ElevenLabs Speech-to-Text
 ELEVENLABS_STT_URL = "https://api.elevenlabs.io/v1/speech-to-text"
 
+# File extensions picked up when a directory is passed on the command line
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.m4a', '.flac', '.ogg', '.webm')
+
+# Responses larger than this (or of unknown size) are parsed incrementally with ijson
+STREAM_THRESHOLD_BYTES = 32 * 1024 * 1024
+
+# Shared session so repeated requests reuse pooled keep-alive connections.
+# urllib3 only retries connections that fail before anything is sent; the streamed
+# upload body cannot be replayed, so status retries happen in transcribe_audio_file
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, read=0, status=0, backoff_factor=0.5)
+))
+
+# Transient statuses retried by re-sending the upload, and how often to try
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_ATTEMPTS = 4
+# Base delay in seconds of the exponential backoff, used when there is no Retry-After header
+RETRY_BACKOFF_SECONDS = 0.5
+
 def transcribe_audio_file(file_path: str, model_id: str = "scribe_v1") -> List[Dict[str, Any]]:
     """
     Transcribe an audio file using ElevenLabs Speech-to-Text API.
@@ -37,50 +72,134 @@ def transcribe_audio_file(file_path: str, model_id: str = "scribe_v1") -> List[D
     
     print(f"Transcribing audio file: {file_path}")
     
-    # Prepare headers with API key
-    headers = {
-        "xi-api-key": ELEVENLABS_API_KEY
-    }
+    try:
+        print("Sending request to ElevenLabs API...")
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            response = post_audio_file(file_path, model_id)
+            if response.status_code not in RETRY_STATUSES or attempt == MAX_ATTEMPTS:
+                break
+            delay = retry_delay(response, attempt)
+            response.close()
+            print(f"ElevenLabs returned {response.status_code}, retrying in {delay:.1f}s "
+                  f"(attempt {attempt + 1}/{MAX_ATTEMPTS})...")
+            time.sleep(delay)
+        
+        # Check if the request was successful
+        response.raise_for_status()
+        
+        if ijson is not None and should_stream_response(response):
+            # Parse the body as it downloads instead of buffering the whole response
+            with response:
+                return process_elevenlabs_stream(response.iter_content(chunk_size=64 * 1024))
+        
+        # Parse the response
+        result = orjson.loads(response.content)
+        
+        # Process the response into our expected format
+        return process_elevenlabs_response(result)
+        
+    except requests.exceptions.RequestException as e:
+        print(f"Error during API request: {e}")
+        if hasattr(e, 'response') and e.response is not None:
+            print(f"Response status code: {e.response.status_code}")
+            print(f"Response content: {e.response.text}")
+        return []
+    except Exception as e:
+        print(f"Error during transcription: {e}")
+        return []
+
+def post_audio_file(file_path: str, model_id: str) -> requests.Response:
+    """
+    Upload an audio file to the ElevenLabs Speech-to-Text API.
+    The file is reopened and the multipart body rebuilt on every call,
+    since a streamed body can only be sent once.
     
-    # Prepare the file for upload
+    Args:
+        file_path: Path to the audio file
+        model_id: ElevenLabs model ID to use for transcription
+    
+    Returns:
+        Response whose body has not been read yet
+    """
     with open(file_path, 'rb') as audio_file:
-        files = {
+        # Stream the multipart body from disk instead of building it in memory
+        encoder = MultipartEncoder(fields={
+            'model_id': model_id,
             'file': (os.path.basename(file_path), audio_file, 'audio/mpeg')
+        })
+        headers = {
+            "xi-api-key": ELEVENLABS_API_KEY,
+            "Content-Type": encoder.content_type
         }
-        
-        # Prepare form data
-        data = {
-            'model_id': model_id
+        return _SESSION.post(
+            ELEVENLABS_STT_URL,
+            headers=headers,
+            data=encoder,
+            stream=True
+        )
+
+def retry_delay(response: requests.Response, attempt: int) -> float:
+    """
+    Get how long to wait before retrying a failed request.
+    
+    Args:
+        response: Response with a retryable status
+        attempt: Number of the attempt that just failed, starting from 1
+    
+    Returns:
+        The Retry-After delay in seconds if the server sent one, otherwise exponential backoff
+    """
+    retry_after = response.headers.get("Retry-After", "")
+    if retry_after.isdigit():
+        return float(retry_after)
+    return RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1)
+
+def should_stream_response(response: requests.Response) -> bool:
+    """
+    Decide whether to parse a response incrementally instead of loading it at once.
+    orjson is several times faster than ijson, so only responses that are too large
+    to comfortably hold in memory, or whose size is unknown, are streamed.
+    
+    Args:
+        response: Response whose body has not been read yet
+    
+    Returns:
+        True if the body should be streamed through ijson
+    """
+    content_length = response.headers.get("Content-Length")
+    if content_length is None or not content_length.isdigit():
+        return True
+    return int(content_length) > STREAM_THRESHOLD_BYTES
+
+def iter_word_entries(words: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Convert ElevenLabs word items into word-level transcript entries,
+    skipping spacing and other non-word items.
+    
+    Args:
+        words: Word items from the ElevenLabs API response
+    
+    Returns:
+        Iterator over word-level transcription entries with timing information
+    """
+    index = 0
+    for word_data in words:
+        # Create an entry for each word with the required fields
+        if word_data.get('type') != 'word':
+            continue
+        start = word_data.get('start', 0)
+        end = word_data.get('end', 0)
+        text = word_data.get('text', '')
+        index += 1
+        yield {
+            'index': index,
+            'text': text,
+            'start': start,
+            # Round to milliseconds without the overhead of round(); floor rather than
+            # int() so negative durations round the same way as positive ones
+            'duration': math.floor((end - start) * 1000 + 0.5) / 1000.0,
+            # 'person': word_data.get('speaker_id', 'unknown')
         }
-        
-        # Make the API request
-        try:
-            print("Sending request to ElevenLabs API...")
-            response = requests.post(
-                ELEVENLABS_STT_URL,
-                headers=headers,
-                files=files,
-                data=data
-            )
-            
-            # Check if the request was successful
-            response.raise_for_status()
-            
-            # Parse the response
-            result = response.json()
-            
-            # Process the response into our expected format
-            return process_elevenlabs_response(result)
-            
-        except requests.exceptions.RequestException as e:
-            print(f"Error during API request: {e}")
-            if hasattr(e, 'response') and e.response is not None:
-                print(f"Response status code: {e.response.status_code}")
-                print(f"Response content: {e.response.text}")
-            return []
-        except Exception as e:
-            print(f"Error during transcription: {e}")
-            return []
 
 def process_elevenlabs_response(response: Dict[str, Any]) -> List[Dict[str, Any]]:
     """
@@ -100,34 +219,9 @@ def process_elevenlabs_response(response: Dict[str, Any]) -> List[Dict[str, Any]
     try:
         # Check if we have the expected fields in the response
         if 'words' in response:
-            index = 0
-            # Process each word in the response
-            for word_data in response['words']:
-                # Create an entry for each word with the required fields
-                if word_data.get('type') != 'word':
-                    continue
-                duration = word_data.get('end', 0) - word_data.get('start', 0)
-                duration = round(duration, 3)
-                index += 1
-                entry = {
-                    'index': index,
-                    'text': word_data.get('text', ''),
-                    'start': word_data.get('start', 0),
-                    'duration': duration,
-                    # 'person': word_data.get('speaker_id', 'unknown')
-                }
-                result.append(entry)
+            result = list(iter_word_entries(response['words']))
         elif 'text' in response:
-            # If we only have full text without word-level timing, create a single entry
-            print("Warning: No word-level timing information available in the response.")
-            entry = {
-                'index': 0,
-                'text': response['text'],
-                'start': 0,
-                'duration': 0,
-                # 'person': 'unknown'
-            }
-            result.append(entry)
+            result = process_text_only_response(response['text'])
         else:
             print("Error: Unexpected response format from ElevenLabs API")
             print(f"Response: {json.dumps(response, indent=2)}")
@@ -136,26 +230,83 @@ def process_elevenlabs_response(response: Dict[str, Any]) -> List[Dict[str, Any]
     
     return result
 
-def estimated_total_duration(file_path: str) -> float:
+def process_elevenlabs_stream(chunks: Iterable[bytes]) -> List[Dict[str, Any]]:
     """
-    Estimate the total duration of an audio file in seconds.
-    This is a very rough estimate based on file size and assumes MP3 format.
-    For more accurate results, consider using a library like pydub or ffmpeg.
+    Incrementally parse a streamed ElevenLabs API response into our expected
+    word-level transcript format, so the raw response never has to be held in memory.
     
     Args:
-        file_path: Path to the audio file
+        chunks: Raw chunks of the JSON response body
     
     Returns:
-        Estimated duration in seconds
+        List of word-level transcription entries with timing information
     """
-    # Get file size in bytes
-    file_size = os.path.getsize(file_path)
+    # Initialize the result list
+    result = []
+    
+    # A single event pass picks up both the word items and the top-level text
+    events = ijson.sendable_list()
+    parser = ijson.parse_coro(events, use_float=True)
+    texts = []
+    has_words = False
     
-    # Rough estimate: Assuming 128 kbps MP3 (16 KB/s)
-    # Duration = file_size / (bitrate / 8)
-    estimated_duration = file_size / (128 * 1024 / 8)
+    def iter_events() -> Iterator[tuple]:
+        for chunk in chunks:
+            parser.send(chunk)
+            yield from events
+            del events[:]
+        parser.close()
+        yield from events
+    
+    def iter_words() -> Iterator[Dict[str, Any]]:
+        nonlocal has_words
+        builder = None
+        for prefix, event, value in iter_events():
+            if prefix == '' and event == 'map_key' and value == 'words':
+                has_words = True
+            elif prefix == 'text' and event == 'string':
+                texts.append(value)
+            elif prefix == 'words.item' and event == 'start_map':
+                builder = ijson.ObjectBuilder()
+            if builder is not None:
+                builder.event(event, value)
+                if prefix == 'words.item' and event == 'end_map':
+                    yield builder.value
+                    builder = None
+    
+    try:
+        result = list(iter_word_entries(iter_words()))
+        # Like process_elevenlabs_response, only fall back to the text when there is no words field
+        if not has_words:
+            if texts:
+                result = process_text_only_response(texts[0])
+            else:
+                print("Error: Unexpected response format from ElevenLabs API")
+    except Exception as e:
+        print(f"Error processing ElevenLabs response: {e}")
+    
+    return result
+
+def process_text_only_response(text: str) -> List[Dict[str, Any]]:
+    """
+    Build a transcript from an ElevenLabs response without word-level timing.
+    
+    Args:
+        text: Full transcript text from the response
     
-    return estimated_duration
+    Returns:
+        Single transcription entry covering the whole text
+    """
+    # If we only have full text without word-level timing, create a single entry
+    print("Warning: No word-level timing information available in the response.")
+    entry = {
+        'index': 0,
+        'text': text,
+        'start': 0,
+        'duration': 0,
+        # 'person': 'unknown'
+    }
+    return [entry]
 
 def save_transcript(transcript: List[Dict[str, Any]], output_path: str) -> None:
     """
@@ -165,55 +316,151 @@ def save_transcript(transcript: List[Dict[str, Any]], output_path: str) -> None:
         transcript: The transcript data
         output_path: Path to save the transcript
     """
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(transcript, f, ensure_ascii=False, indent=2)
+    with open(output_path, 'wb') as f:
+        f.write(orjson.dumps(transcript, option=orjson.OPT_INDENT_2))
     
     print(f"Transcript saved to: {output_path}")
     
     # Also save as plain text for easy reading
     text_file = output_path.replace('.json', '.txt')
-    with open(text_file, 'w', encoding='utf-8') as f:
-        for entry in transcript:
-            f.write(f"[{entry['start']:.2f}s - {entry['start'] + entry['duration']:.2f}s] {entry['text']}\n")
+    lines = [f"[{entry['start']:.2f}s - {entry['start'] + entry['duration']:.2f}s] {entry['text']}\n"
+             for entry in transcript]
+    with open(text_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
+        f.write("".join(lines))
     
     print(f"Plain text transcript saved to: {text_file}")
 
-# Main execution
-if __name__ == "__main__":
-    import argparse
-    
-    parser = argparse.ArgumentParser(description="Transcribe audio files using ElevenLabs API")
-    parser.add_argument("file_path", help="Path to the audio file to transcribe")
-    parser.add_argument("--model", default="scribe_v1", 
-                        help="ElevenLabs model ID to use (default: scribe_v1)")
-    parser.add_argument("--output", help="Output file path (default: input_file_transcript.json)")
-    parser.add_argument("--force", action="store_true", 
-                        help="Force transcription even if output file already exists")
-    
-    args = parser.parse_args()
+def transcribe_to_file(file_path: str, output_path: str, model_id: str = "scribe_v1",
+                       force: bool = False) -> List[Dict[str, Any]]:
+    """
+    Transcribe an audio file and save the transcript, reusing an existing
+    transcript file unless forced.
     
-    # Set default output path if not provided
-    if not args.output:
-        base_name = os.path.splitext(args.file_path)[0]
-        args.output = f"{base_name}_elevenlabs_transcript.json"
+    Args:
+        file_path: Path to the audio file
+        output_path: Path to save the transcript
+        model_id: ElevenLabs model ID to use for transcription
+        force: Force transcription even if the output file already exists
     
+    Returns:
+        List of word-level transcription entries with timing information
+    """
     # Check if transcript file already exists
-    if os.path.exists(args.output) and not args.force:
-        print(f"Transcript file already exists: {args.output}")
+    if os.path.exists(output_path) and not force:
+        print(f"Transcript file already exists: {output_path}")
         print("Loading existing transcript instead of transcribing again.")
         
         # Load the existing transcript
-        with open(args.output, 'r', encoding='utf-8') as f:
+        with open(output_path, 'r', encoding='utf-8') as f:
             transcript = json.load(f)
         
         print(f"Loaded existing transcript with {len(transcript)} entries")
     else:
         # Transcribe the audio file
-        transcript = transcribe_audio_file(args.file_path, args.model)
+        transcript = transcribe_audio_file(file_path, model_id)
         
         if transcript:
             # Save the transcript
-            save_transcript(transcript, args.output)
+            save_transcript(transcript, output_path)
             print(f"Transcription completed with {len(transcript)} entries")
         else:
-            print("Transcription failed or returned no results")
+            print(f"Transcription failed or returned no results: {file_path}")
+    
+    return transcript
+
+def default_output_path(file_path: str) -> str:
+    """
+    Get the default transcript path for an audio file.
+    
+    Args:
+        file_path: Path to the audio file
+    
+    Returns:
+        Path of the form <audio_file_base>_elevenlabs_transcript.json
+    """
+    base_name = os.path.splitext(file_path)[0]
+    return f"{base_name}_elevenlabs_transcript.json"
+
+def is_generated_audio(file_path: str) -> bool:
+    """
+    Check whether an audio file is fake audio written by create_fake_audio.py,
+    whose default output name is <name>_fake.<ext>.
+    
+    Args:
+        file_path: Path to the audio file
+    
+    Returns:
+        True if the file name marks it as generated fake audio
+    """
+    return os.path.splitext(os.path.basename(file_path))[0].endswith('_fake')
+
+def collect_audio_files(paths: List[str], include_fake: bool = False) -> List[str]:
+    """
+    Expand directories and glob patterns into a list of audio files.
+    Fake audio generated by this pipeline (*_fake.mp3) is skipped when expanding
+    directories and globs unless include_fake is set; files named explicitly are always kept.
+    
+    Args:
+        paths: Audio file paths, directories or glob patterns
+        include_fake: Also pick up generated *_fake audio from directories and globs
+    
+    Returns:
+        List of audio file paths, without duplicates
+    """
+    audio_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            matches = sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.lower().endswith(AUDIO_EXTENSIONS)
+            )
+        elif any(ch in path for ch in '*?['):
+            matches = sorted(glob.glob(path))
+        else:
+            audio_files.append(path)
+            continue
+        audio_files.extend(match for match in matches if include_fake or not is_generated_audio(match))
+    return list(dict.fromkeys(audio_files))
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Transcribe audio files using ElevenLabs API")
+    parser.add_argument("file_paths", nargs="+",
+                        help="Audio files, directories or glob patterns to transcribe")
+    parser.add_argument("--model", default="scribe_v1", 
+                        help="ElevenLabs model ID to use (default: scribe_v1)")
+    parser.add_argument("--output", help="Output file path, single file only (default: input_file_transcript.json)")
+    parser.add_argument("--force", action="store_true", 
+                        help="Force transcription even if output file already exists")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Number of files to transcribe concurrently (default: 4)")
+    parser.add_argument("--include-fake", action="store_true",
+                        help="Also transcribe generated *_fake audio found in directories and globs")
+    
+    args = parser.parse_args()
+    
+    audio_files = collect_audio_files(args.file_paths, args.include_fake)
+    if not audio_files:
+        parser.error("No audio files found")
+    if args.output and len(audio_files) > 1:
+        parser.error("--output can only be used with a single audio file")
+    
+    if len(audio_files) == 1:
+        # Set default output path if not provided
+        output_path = args.output or default_output_path(audio_files[0])
+        transcribe_to_file(audio_files[0], output_path, args.model, args.force)
+    else:
+        # Transcribe files concurrently; each transcript is saved as soon as it completes
+        print(f"Transcribing {len(audio_files)} files with {args.workers} workers")
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            futures = {
+                executor.submit(transcribe_to_file, file_path, default_output_path(file_path),
+                                args.model, args.force): file_path
+                for file_path in audio_files
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Error transcribing {futures[future]}: {e}")
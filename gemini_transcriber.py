@@ -1,8 +1,29 @@
 import os
 import json
+import asyncio
+import hashlib
+import io
+import re
+import subprocess
+import sys
+import tempfile
+import numpy as np
+import orjson
 import google.generativeai as genai
+from typing_extensions import TypedDict
+from google.api_core import exceptions as google_exceptions
+from aiolimiter import AsyncLimiter
+from rapidfuzz.fuzz import ratio
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
 from dotenv import load_dotenv
-import time
+
+try:
+    import mutagen
+except ImportError:  # Optional: fall back to ffprobe for durations
+    mutagen = None
+
+class TranscriptionError(Exception):
+    """Raised when an audio file could not be transcribed."""
 
 # Load environment variables from .env file
 load_dotenv()
@@ -14,123 +35,218 @@ if not GEMINI_API_KEY:
 
 genai.configure(api_key=GEMINI_API_KEY)
 
-def transcribe_audio_chunk(audio_chunk, model):
-    """Transcribe a single chunk of audio data."""
-    prompt = '''Generate a transcript of the speech with precise word-by-word timing.
-Return the result as a JSON array where each entry contains a single word with its timing information.
-Each entry should have the following format:
-{
-    "index": sequential_number_starting_from_0,
-    "text": "word",
-    "start": start_time_in_seconds,
-    "duration": duration_in_seconds,
-    "person": "label of the speaking person"
-}
-
-IMPORTANT: Make sure the JSON is valid and properly formatted. Do not include any explanatory text before or after the JSON array.
-Start your response with [ and end with ], and make sure all entries are properly separated with commas.'''
-
-    # Generate content with the audio chunk
+# Silence detection settings used to pick chunk boundaries
+SILENCE_THRESHOLD_DB = -35
+MIN_SILENCE_SECONDS = 0.5
+SILENCE_PATTERN = re.compile(r"silence_(start|end): (-?\d+(?:\.\d+)?)")
+
+# Maximum number of chunks sent to Gemini at the same time
+MAX_CONCURRENCY = 8
+# Maximum number of Gemini API requests (uploads, status polls, generations
+# and deletes, including retries) started per second
+REQUESTS_PER_SECOND = 2
+
+# Seconds between checks on an uploaded file that Gemini is still processing
+FILE_POLL_SECONDS = 1
+# Give up on an uploaded file that is still processing after this many seconds
+FILE_PROCESSING_TIMEOUT = 300
+
+# Gemini errors worth retrying: rate limits and transient server failures.
+# Anything else (e.g. InvalidArgument) fails on the first attempt.
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+)
+
+# Longest wait in seconds between retries. A task keeps its concurrency slot while it
+# waits, so a larger server hint is ignored in favor of the backoff
+MAX_RETRY_WAIT_SECONDS = 30
+# Backoff between retries when the error doesn't say how long to wait
+BACKOFF = wait_exponential_jitter(initial=1, max=MAX_RETRY_WAIT_SECONDS)
+
+class WordEntry(TypedDict):
+    """A single transcribed word, as returned by Gemini."""
+    index: int
+    text: str
+    start: float
+    duration: float
+    person: str
+
+# Constrain Gemini to a bare JSON array of words, so the response never needs repairing
+TRANSCRIPT_GENERATION_CONFIG = genai.GenerationConfig(
+    response_mime_type="application/json",
+    response_schema=list[WordEntry],
+)
+
+# The response schema fixes the JSON layout, so the prompt only has to describe the fields
+TRANSCRIPTION_PROMPT = (
+    "Generate a transcript of the speech with precise word-by-word timing. "
+    "Return one entry per word: its index (sequential, starting from 0), the word text, "
+    "its start time and duration in seconds, and a label for the person speaking."
+)
+
+# Directory where chunk transcripts are cached between runs. It is the same directory
+# gemini_analyzer caches its analyses in: analyses are stored as gemini_<key>.json and
+# chunk transcripts as transcript_<key>.json, so the two never collide
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "fake-conversations")
+
+def get_cache_path(audio_chunk, prompt, model_name):
+    """Get the cache file path for a chunk, keyed by its audio bytes, the prompt and the model."""
+    key = hashlib.blake2b(digest_size=16)
+    key.update(f"{model_name}\n{prompt}\n".encode('utf-8'))
+    key.update(audio_chunk)
+    return os.path.join(CACHE_DIR, f"transcript_{key.hexdigest()}.json")
+
+def load_cached_transcript(cache_path):
+    """Load a cached chunk transcript, returning an empty list on a cache miss."""
     try:
-        response = model.generate_content(
-            contents=[{"parts": [{"text": prompt}, {"inline_data": {"mime_type": "audio/mp3", "data": audio_chunk}}]}]
-        )
+        if os.path.getsize(cache_path) > 0:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except (OSError, ValueError):
+        pass
+    return []
 
-        # Get the transcript text
-        transcript = response.text.strip()
-        
-        # Clean up the response - remove any markdown formatting
-        if transcript.startswith("```json"):
-            transcript = transcript[7:]
-        if transcript.endswith("```"):
-            transcript = transcript[:-3]
-        transcript = transcript.strip()
-        
-        # Try to parse the JSON
-        try:
-            transcript_data = json.loads(transcript)
-            return transcript_data
-        except json.JSONDecodeError as e:
-            print(f"Error parsing JSON: {e}")
-            
-            # Try a more aggressive approach to extract a valid JSON array
-            import re
-            
-            # Find anything that looks like a JSON array
-            json_pattern = r'\[\s*\{.*\}\s*\]'
-            match = re.search(json_pattern, transcript, re.DOTALL)
-            
-            if match:
-                json_str = match.group(0)
+def save_cached_transcript(cache_path, transcript_data):
+    """Atomically write a chunk transcript to the cache."""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(transcript_data, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: Could not write transcript cache: {e}")
+
+def retry_delay_hint(exception):
+    """Get the delay in seconds the server asked for before retrying, or None if there is no hint.
+    Looks for a retry_after attribute, then for a google.rpc.RetryInfo in the error details.
+    """
+    retry_after = getattr(exception, "retry_after", None)
+    if retry_after is not None:
+        return float(retry_after)
+    
+    for detail in getattr(exception, "details", None) or ():
+        if isinstance(detail, dict):
+            # REST transport: {"@type": ".../google.rpc.RetryInfo", "retryDelay": "23s"}
+            delay = detail.get("retryDelay")
+            if isinstance(delay, str) and delay.endswith("s"):
                 try:
-                    # Try to fix common JSON issues
-                    json_str = json_str.replace('\n', ' ').replace('\r', '')
-                    # Remove control characters that might cause parsing issues
-                    json_str = ''.join(ch for ch in json_str if ord(ch) >= 32 or ch in '\t\r\n')
-                    transcript_data = json.loads(json_str)
-                    return transcript_data
-                except json.JSONDecodeError as e2:
-                    print(f"Still couldn't parse extracted JSON: {e2}")
-                    # Try one more approach - parse line by line
-                    try:
-                        # Last resort: try to manually construct a valid JSON array
-                        print("Attempting manual JSON reconstruction...")
-                        lines = transcript.split('\n')
-                        valid_entries = []
-                        current_entry = ""
-                        in_entry = False
-                        
-                        for line in lines:
-                            line = line.strip()
-                            if line.startswith('{'):
-                                in_entry = True
-                                current_entry = line
-                            elif line.endswith('},') or line.endswith('}') and in_entry:
-                                current_entry += line
-                                try:
-                                    # Fix the entry if it ends with a comma
-                                    if current_entry.endswith(','):
-                                        current_entry = current_entry[:-1]
-                                    # Make sure it's a valid JSON object
-                                    entry_json = json.loads(current_entry)
-                                    valid_entries.append(entry_json)
-                                except json.JSONDecodeError:
-                                    pass  # Skip invalid entries
-                                in_entry = False
-                                current_entry = ""
-                            elif in_entry:
-                                current_entry += line
-                        
-                        if valid_entries:
-                            print(f"Manually reconstructed {len(valid_entries)} valid entries")
-                            return valid_entries
-                    except Exception as e3:
-                        print(f"Manual reconstruction failed: {e3}")
-                    return []
-            else:
-                print("Could not find a JSON array pattern in the response")
-                return []
+                    return float(delay[:-1])
+                except ValueError:
+                    pass
+            continue
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None:
+            # A timedelta (proto-plus) or a protobuf Duration
+            if hasattr(delay, "total_seconds"):
+                return delay.total_seconds()
+            return delay.seconds + delay.nanos / 1e9
+    return None
+
+def wait_for_retry(retry_state):
+    """Wait as long as the server asked for, up to MAX_RETRY_WAIT_SECONDS,
+    falling back to exponential backoff with jitter.
+    """
+    hint = retry_delay_hint(retry_state.outcome.exception())
+    if hint is not None and 0 <= hint <= MAX_RETRY_WAIT_SECONDS:
+        return hint
+    return BACKOFF(retry_state)
+
+@retry(retry=retry_if_exception_type(RETRYABLE_ERRORS), wait=wait_for_retry,
+       stop=stop_after_attempt(5), reraise=True)
+async def generate_content(model, contents, limiter):
+    """Call Gemini, retrying rate limits and server errors after the server's suggested delay
+    or with exponential backoff and jitter. Every attempt counts against the rate limit.
+    """
+    async with limiter:
+        return await model.generate_content_async(contents=contents)
+
+async def call_api(limiter, func, *args, **kwargs):
+    """Run a blocking Gemini client call in a worker thread, within the rate limit."""
+    async with limiter:
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+async def delete_uploaded_file(audio_file, limiter):
+    """Delete an uploaded file, warning instead of raising if the delete fails.
+    Uploaded files expire on their own, so a failed cleanup must not cost the chunk's transcript.
+    """
+    try:
+        await call_api(limiter, genai.delete_file, audio_file.name)
     except Exception as e:
-        print(f"Error during transcription: {e}")
-        return []
+        print(f"Warning: Could not delete uploaded file {audio_file.name}: {e}")
+
+async def upload_audio(audio_chunk, limiter):
+    """Upload audio bytes with the Gemini File API and wait until the file is ready to use.
+    The uploaded file is deleted again if it never becomes usable.
+    """
+    audio_file = await call_api(limiter, genai.upload_file, io.BytesIO(audio_chunk), mime_type="audio/mp3")
+    try:
+        deadline = asyncio.get_running_loop().time() + FILE_PROCESSING_TIMEOUT
+        while audio_file.state.name == "PROCESSING":
+            if asyncio.get_running_loop().time() >= deadline:
+                raise TimeoutError(f"Gemini did not process uploaded audio {audio_file.name} "
+                                   f"within {FILE_PROCESSING_TIMEOUT} seconds")
+            await asyncio.sleep(FILE_POLL_SECONDS)
+            audio_file = await call_api(limiter, genai.get_file, audio_file.name)
+        if audio_file.state.name != "ACTIVE":
+            raise ValueError(f"Gemini could not process uploaded audio {audio_file.name}: {audio_file.state.name}")
+    except BaseException:
+        # Includes a failed get_file call and cancellation
+        await delete_uploaded_file(audio_file, limiter)
+        raise
+    return audio_file
 
+async def transcribe_audio_chunk(audio_chunk, model, limiter):
+    """Transcribe a single chunk of audio data, reusing a cached transcript of identical audio.
+    Every Gemini API request it makes goes through limiter.
+    """
+    cache_path = get_cache_path(audio_chunk, TRANSCRIPTION_PROMPT, model.model_name)
+    cached_transcript = load_cached_transcript(cache_path)
+    if cached_transcript:
+        print(f"Using cached transcript: {cache_path}")
+        return cached_transcript
 
-def merge_transcripts(chunks, overlap_seconds=0):
-    """Merge transcript chunks, handling overlaps appropriately."""
+    # Upload the raw audio instead of inlining it as base64, then generate content
+    # referencing it; the response schema forces a bare JSON array
+    audio_file = await upload_audio(audio_chunk, limiter)
+    try:
+        response = await generate_content(model, [TRANSCRIPTION_PROMPT, audio_file], limiter)
+    finally:
+        await delete_uploaded_file(audio_file, limiter)
+    
+    try:
+        transcript_data = json.loads(response.text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Gemini returned invalid transcript JSON: {e}") from e
+    save_cached_transcript(cache_path, transcript_data)
+    return transcript_data
+
+
+def merge_transcripts(chunks, overlap_seconds=0, offsets=None):
+    """Merge transcript chunks, handling overlaps appropriately.
+    offsets, if given, holds the time offset in seconds to add to each chunk's start times.
+    """
     if not chunks:
         return []
     
-    # Start with an empty result
-    merged = []
-    
     # Add all words from all chunks to a single list
-    for chunk in chunks:
-        if not chunk:
-            continue
-        merged.extend(chunk)
+    merged = [entry for chunk in chunks if chunk for entry in chunk]
+    if not merged:
+        return []
     
-    # Sort by start time
-    merged.sort(key=lambda x: x['start'])
+    # Shift every chunk by its offset in one broadcast, then sort by start time.
+    # The stable sort keeps words with equal start times in chunk order
+    starts = np.fromiter((entry['start'] for entry in merged), dtype=float, count=len(merged))
+    if offsets is not None:
+        lengths = [len(chunk) if chunk else 0 for chunk in chunks]
+        starts += np.repeat(np.asarray(offsets, dtype=float), lengths)
+    order = np.argsort(starts, kind='stable')
+    merged = [merged[i] for i in order.tolist()]
+    for entry, start in zip(merged, starts[order].tolist()):
+        entry['start'] = start
     
     # Remove duplicates (words that are too close in time and have similar text)
     if len(merged) > 1:
@@ -147,12 +263,11 @@ def merge_transcripts(chunks, overlap_seconds=0):
             if time_diff > overlap_seconds:
                 filtered.append(current)
             else:
-                # Check for text similarity
-                from difflib import SequenceMatcher
-                similarity = SequenceMatcher(None, current['text'], previous['text']).ratio()
-                
-                # If texts are different enough, keep both
-                if similarity < 0.7:  # Threshold for similarity
+                # Identical text is always a duplicate; otherwise check for text similarity.
+                # ratio() returns 0 when the score is below the cutoff
+                if current['text'] != previous['text'] and not ratio(current['text'], previous['text'],
+                                                                     score_cutoff=70):  # Threshold for similarity
+                    # If texts are different enough, keep both
                     filtered.append(current)
                 # Otherwise, keep the longer one
                 elif len(current['text']) > len(previous['text']):
@@ -164,67 +279,137 @@ def merge_transcripts(chunks, overlap_seconds=0):
             
         return filtered
     
+    merged[0]['index'] = 0
     return merged
 
 
-def transcribe_audio_file(file_path, chunk_size_mb=10, overlap_mb=1):
-    """Transcribe an audio file by processing it in chunks with overlap."""
+def detect_silences(file_path):
+    """Find silent stretches in an audio file with ffmpeg's silencedetect filter.
+    Returns the midpoint of each silence in seconds. ffmpeg decodes the file as a
+    stream, so the decoded audio never has to fit in memory.
+    """
+    result = subprocess.run(
+        ["ffmpeg", "-nostdin", "-hide_banner", "-i", file_path,
+         "-af", f"silencedetect=noise={SILENCE_THRESHOLD_DB}dB:d={MIN_SILENCE_SECONDS}", "-f", "null", "-"],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    
+    midpoints = []
+    silence_start = None
+    for kind, value in SILENCE_PATTERN.findall(result.stderr):
+        if kind == "start":
+            silence_start = max(float(value), 0.0)
+        elif silence_start is not None:
+            midpoints.append((silence_start + float(value)) / 2)
+            silence_start = None
+    return midpoints
+
+def plan_chunks(silences, total_duration, target_duration):
+    """Split the audio into chunks of at most target_duration seconds.
+    Each chunk ends at the last silence before the limit, if there is one in the second
+    half of the chunk, and otherwise at the limit itself. Returns (start, duration) pairs;
+    the last duration is None so the final chunk always runs to the end of the file.
+    """
+    chunks = []
+    start = 0.0
+    i = 0
+    while total_duration - start > target_duration:
+        limit = start + target_duration
+        cut = limit
+        while i < len(silences) and silences[i] <= limit:
+            if silences[i] > start + target_duration / 2:
+                cut = silences[i]
+            i += 1
+        chunks.append((start, cut - start))
+        start = cut
+    chunks.append((start, None))
+    return chunks
+
+async def extract_chunk(file_path, start, duration):
+    """Cut a chunk out of the audio file with ffmpeg, copying the MP3 frames without re-encoding."""
+    cmd = ["ffmpeg", "-nostdin", "-loglevel", "error", "-ss", f"{start:.3f}"]
+    if duration is not None:
+        cmd += ["-t", f"{duration:.3f}"]
+    cmd += ["-i", file_path, "-map", "0:a", "-c", "copy", "-f", "mp3", "pipe:1"]
+    
+    process = await asyncio.create_subprocess_exec(*cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    audio_chunk, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, audio_chunk, stderr)
+    return audio_chunk
+
+async def transcribe_chunks(file_path, chunks, model, limiter):
+    """Transcribe (start, duration) chunks of the audio concurrently, returning the transcripts in chunk order."""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    
+    async def transcribe_chunk(i, start, duration):
+        async with semaphore:
+            # Cut the chunk only when it is sent, so at most MAX_CONCURRENCY chunks are in memory
+            audio_chunk = await extract_chunk(file_path, start, duration)
+            print(f"Processing chunk {i+1}/{len(chunks)} at {start:.2f}s ({len(audio_chunk) / (1024 * 1024):.2f} MB)")
+            return await transcribe_audio_chunk(audio_chunk, model, limiter)
+    
+    # A chunk that still fails after retrying comes back as its exception,
+    # so the chunks that succeeded are kept
+    return await asyncio.gather(*(transcribe_chunk(i, start, duration)
+                                  for i, (start, duration) in enumerate(chunks)),
+                                return_exceptions=True)
+
+
+def transcribe_audio_file(file_path, chunk_size_mb=10):
+    """Transcribe an audio file by processing it in chunks split at silences.
+    Chunks that still fail after retrying are reported and left out of the transcript.
+    Raises TranscriptionError if no part of the file could be transcribed.
+    """
     # Create a model instance
-    model = genai.GenerativeModel('gemini-2.0-flash')
+    model = genai.GenerativeModel('gemini-2.0-flash', generation_config=TRANSCRIPT_GENERATION_CONFIG)
+    # Shared by every API request of this run
+    limiter = AsyncLimiter(REQUESTS_PER_SECOND, 1)
     
-    # Calculate chunk sizes in bytes
+    # Calculate chunk size in bytes
     chunk_size = chunk_size_mb * 1024 * 1024  # Convert MB to bytes
-    overlap_size = overlap_mb * 1024 * 1024   # Convert MB to bytes
     
     # Get file size
     file_size = os.path.getsize(file_path)
     print(f"Audio file size: {file_size / (1024 * 1024):.2f} MB")
     
-    # Read the audio file
-    with open(file_path, 'rb') as f:
-        audio_data = f.read()
-    
     # If file is smaller than chunk size, process it all at once
     if file_size <= chunk_size:
         print("File is smaller than chunk size, processing entire file at once")
-        transcript = transcribe_audio_chunk(audio_data, model)
+        with open(file_path, 'rb') as f:
+            audio_data = f.read()
+        try:
+            transcript = asyncio.run(transcribe_audio_chunk(audio_data, model, limiter))
+        except Exception as e:
+            raise TranscriptionError(f"Could not transcribe {file_path}: {e}") from e
         # Ensure each entry has an index if not already provided
         for idx, entry in enumerate(transcript):
             if 'index' not in entry:
                 entry['index'] = idx
         return transcript
     
-    # Process in chunks
-    chunks = []
-    chunk_transcripts = []
-    overlap_seconds = 5  # Estimated overlap in seconds
-    
-    # Calculate number of chunks
-    num_chunks = (file_size - overlap_size) // (chunk_size - overlap_size)
-    if (file_size - overlap_size) % (chunk_size - overlap_size) > 0:
-        num_chunks += 1
+    # Get the total duration to turn the chunk size into a chunk duration
+    total_duration = estimated_total_duration(file_path)
+    print(f"Total duration: {total_duration:.2f} seconds")
+    target_duration = chunk_size / (file_size / total_duration)
     
-    print(f"Processing audio in {num_chunks} chunks of {chunk_size_mb}MB with {overlap_mb}MB overlap")
+    # Cut at silences so no word is split between chunks; the chunks don't overlap
+    # and each chunk's start time is its exact time offset
+    chunks = plan_chunks(detect_silences(file_path), total_duration, target_duration)
+    print(f"Processing audio in {len(chunks)} chunks of up to {chunk_size_mb}MB split at silences")
     
-    # Estimate total duration for timestamp adjustments
-    total_duration = estimated_total_duration(file_path)
-    print(f"Estimated total duration: {total_duration:.2f} seconds")
+    transcripts = asyncio.run(transcribe_chunks(file_path, chunks, model, limiter))
     
-    for i in range(num_chunks):
-        # Calculate chunk start and end positions
-        start_pos = i * (chunk_size - overlap_size)
-        end_pos = min(start_pos + chunk_size, file_size)
-        
-        # Extract chunk
-        chunk = audio_data[start_pos:end_pos]
-        chunks.append(chunk)
-        
-        print(f"Processing chunk {i+1}/{num_chunks} ({len(chunk) / (1024 * 1024):.2f} MB)")
-        
-        # Transcribe chunk
-        transcript = transcribe_audio_chunk(chunk, model)
-        
-        if transcript:
+    chunk_transcripts = []
+    chunk_offsets = []
+    failed_chunks = []
+    for i, ((time_offset, _), transcript) in enumerate(zip(chunks, transcripts)):
+        if isinstance(transcript, BaseException):
+            if not isinstance(transcript, Exception):
+                raise transcript
+            print(f"Chunk {i+1} transcription failed: {transcript!r}")
+            failed_chunks.append(i + 1)
+        elif transcript:
             # Ensure each entry has an index if not already provided
             for idx, entry in enumerate(transcript):
                 if 'index' not in entry:
@@ -232,43 +417,55 @@ def transcribe_audio_file(file_path, chunk_size_mb=10, overlap_mb=1):
                     
             # If this is not the first chunk, adjust timing for the current chunk
             if i > 0:
-                # Calculate time offset based on the chunk's position relative to file size
-                # and the estimated total duration
-                time_offset = (start_pos / file_size) * total_duration
+                # merge_transcripts applies the offset
                 print(f"Applying time offset of {time_offset:.2f} seconds to chunk {i+1}")
                 
-                # Adjust all timestamps in this chunk
+                # Ensure we have all required fields
                 for phrase in transcript:
-                    phrase['start'] += time_offset
-                    # Ensure we have all required fields
                     if 'duration' not in phrase:
                         phrase['duration'] = 1.0  # Default duration if missing
                     if 'person' not in phrase:
                         phrase['person'] = "unknown"  # Default speaker if missing
             
             chunk_transcripts.append(transcript)
+            chunk_offsets.append(time_offset)
             print(f"Chunk {i+1} transcription complete: {len(transcript)} words")
         else:
             print(f"Chunk {i+1} transcription failed or returned empty result")
-        
-        # Add a small delay to avoid rate limiting
-        time.sleep(1)
     
-    # Merge all chunk transcripts
-    merged_transcript = merge_transcripts(chunk_transcripts, overlap_seconds)
+    if failed_chunks:
+        if len(failed_chunks) == len(chunks):
+            first_error = next(t for t in transcripts if isinstance(t, Exception))
+            raise TranscriptionError(f"All {len(chunks)} chunks of {file_path} failed to transcribe") from first_error
+        print(f"Warning: chunks {', '.join(map(str, failed_chunks))} failed; "
+              "their audio is missing from the transcript")
     
-    # Sort the transcript by start time and reindex
-    merged_transcript.sort(key=lambda x: x['start'])
-    for idx, entry in enumerate(merged_transcript):
-        entry['index'] = idx
-    
-    return merged_transcript
+    # Merge all chunk transcripts; the result is sorted by start time and reindexed.
+    # Without overlap there are no duplicated words to drop between chunks
+    return merge_transcripts(chunk_transcripts, 0, chunk_offsets)
 
 def estimated_total_duration(file_path):
-    """Estimate the total duration of an audio file in seconds.
-    This is a very rough estimate based on file size and assumes MP3 format.
-    For more accurate results, consider using a library like pydub or ffmpeg.
+    """Get the total duration of an audio file in seconds.
+    The duration is read from the file headers with mutagen, or with ffprobe if mutagen
+    is not installed. Only if both fail is it estimated from the file size.
     """
+    if mutagen is not None:
+        try:
+            audio = mutagen.File(file_path)
+            if audio is not None and audio.info.length:
+                return audio.info.length
+        except mutagen.MutagenError:
+            pass
+    
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", file_path],
+            check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        return float(result.stdout)
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        pass
+    
     # Rough estimate: ~1MB per minute for medium quality MP3
     file_size_mb = os.path.getsize(file_path) / (1024 * 1024)
     estimated_minutes = file_size_mb
@@ -280,7 +477,12 @@ if __name__ == "__main__":
     audio_file_path = 'downloads/4zjvQd8dslY.mp3'
     
     # Transcribe the audio file
-    transcript_data = transcribe_audio_file(audio_file_path)
+    try:
+        transcript_data = transcribe_audio_file(audio_file_path)
+    except TranscriptionError as e:
+        print(f"Error: {e}")
+        print(f"Cause: {e.__cause__!r}")
+        sys.exit(1)
     
     # Create the output file paths
     file_name = os.path.basename(audio_file_path)
@@ -288,8 +490,8 @@ if __name__ == "__main__":
     output_file_path = f"downloads/{file_base}_transcript.json"
     
     # Save the transcript as a JSON array
-    with open(output_file_path, 'w') as f:
-        json.dump(transcript_data, f, indent=2)
+    with open(output_file_path, 'wb') as f:
+        f.write(orjson.dumps(transcript_data, option=orjson.OPT_INDENT_2))
     
     print(f"Transcript saved to {output_file_path}")
     print(f"Found {len(transcript_data)} words in the transcript")
@@ -297,8 +499,8 @@ if __name__ == "__main__":
     # Also save as plain text for easier reading
     text_output_path = f"downloads/{file_base}_transcript.txt"
     with open(text_output_path, 'w') as f:
-        for phrase in transcript_data:
-            f.write(f"{phrase['index']}: {phrase['start']:.2f} - {phrase['start'] + phrase['duration']:.2f}: {phrase['text']}\n")
+        f.write("".join(f"{phrase['index']}: {phrase['start']:.2f} - {phrase['start'] + phrase['duration']:.2f}: {phrase['text']}\n"
+                        for phrase in transcript_data))
     
     print(f"Plain text transcript saved to {text_output_path}")
     
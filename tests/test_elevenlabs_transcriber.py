@@ -0,0 +1,48 @@
+import os
+import unittest
+
+import orjson
+
+# The module refuses to import without an API key; no request is made in these tests
+os.environ.setdefault("ELEVENLABS_API_KEY", "test")
+
+import elevenlabs_transcriber  # noqa: E402
+
+
+PAYLOADS = {
+    "words": {
+        "text": "Hello world",
+        "words": [
+            {"text": "Hello", "start": 0.0, "end": 0.42, "type": "word"},
+            {"text": " ", "start": 0.42, "end": 0.5, "type": "spacing"},
+            {"text": "world", "start": 0.5, "end": 0.9, "type": "word",
+             "characters": [{"text": "w", "start": 0.5, "end": 0.6}]},
+        ],
+    },
+    "empty_words": {"text": "Hello world", "words": []},
+    "text_only": {"text": "Hello world"},
+    "unexpected": {"language_code": "en"},
+}
+
+
+class ProcessResponseTest(unittest.TestCase):
+    def test_stream_matches_buffered(self):
+        """The streaming and buffered parsers agree on every response shape."""
+        for name, payload in PAYLOADS.items():
+            with self.subTest(payload=name):
+                body = orjson.dumps(payload)
+                # Split the body into small chunks so tokens straddle chunk boundaries
+                chunks = [body[i:i + 7] for i in range(0, len(body), 7)]
+                self.assertEqual(
+                    elevenlabs_transcriber.process_elevenlabs_stream(iter(chunks)),
+                    elevenlabs_transcriber.process_elevenlabs_response(payload),
+                )
+
+    def test_empty_words_is_not_text_only(self):
+        """An empty words field yields no entries rather than falling back to the text."""
+        body = orjson.dumps(PAYLOADS["empty_words"])
+        self.assertEqual(elevenlabs_transcriber.process_elevenlabs_stream(iter([body])), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,23 +6,34 @@ This script downloads audio and transcript from YouTube videos using yt-dlp.
 
 import os
 import sys
+import shutil
 import argparse
-import json
+import functools
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import orjson
 from typing import Dict, Any, Optional
 import yt_dlp
 from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound
 
 
+@functools.lru_cache(maxsize=256)
 def extract_video_id(url: str) -> str:
     """Extract the video ID from a YouTube URL."""
-    if "youtu.be" in url:
+    parsed = urllib.parse.urlparse(url)
+    if not parsed.scheme:
+        # Without a scheme (e.g. "youtu.be/abc123") the host is parsed as part of the path
+        parsed = urllib.parse.urlparse("//" + url)
+    host = parsed.netloc.lower()
+    if host == "youtu.be" or host.endswith(".youtu.be"):
         # Handle youtu.be URLs
-        return url.split("/")[-1].split("?")[0]
-    elif "youtube.com" in url:
+        return parsed.path.strip("/").split("/")[0] or url
+    elif host == "youtube.com" or host.endswith(".youtube.com"):
         # Handle youtube.com URLs
-        if "v=" in url:
-            video_id = url.split("v=")[1].split("&")[0]
-            return video_id
+        video_ids = urllib.parse.parse_qs(parsed.query).get("v")
+        if video_ids:
+            return video_ids[0]
     
     # If we can't extract the ID, return the original URL
     # yt-dlp will handle it
@@ -66,6 +77,12 @@ def download_audio(url: str, output_dir: str = "downloads", force: bool = False)
         'no_warnings': False,
     }
     
+    # Fetch with 16 parallel connections when aria2c is installed,
+    # otherwise keep yt-dlp's built-in single-stream downloader
+    if shutil.which('aria2c'):
+        ydl_opts['external_downloader'] = 'aria2c'
+        ydl_opts['external_downloader_args'] = {'aria2c': ['-x', '16', '-s', '16', '-k', '1M']}
+    
     try:
         # Download the audio
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
@@ -114,25 +131,28 @@ def download_transcript(url: str, output_dir: str = "downloads", force: bool = F
         transcript = YouTubeTranscriptApi.get_transcript(video_id)
         
         # Fix durations to ensure each segment doesn't overlap with the next one
-        for i in range(len(transcript) - 1):
-            current_end = transcript[i]['start'] + transcript[i]['duration']
-            next_start = transcript[i + 1]['start']
+        if len(transcript) > 1:
+            starts = np.fromiter((entry['start'] for entry in transcript), dtype=float, count=len(transcript))
+            durations = np.fromiter((entry['duration'] for entry in transcript), dtype=float, count=len(transcript))
+            next_starts = starts[1:]
             
-            # If current segment ends after the next one starts, adjust the duration
-            if current_end > next_start:
-                # Set duration so that it ends exactly at the start of the next segment
-                transcript[i]['duration'] = max(0.1, next_start - transcript[i]['start'])
+            # Segments that end after the next one starts
+            overlapping = np.flatnonzero(starts[:-1] + durations[:-1] > next_starts)
+            # Set duration so that each ends exactly at the start of the next segment
+            fixed_durations = np.maximum(0.1, next_starts[overlapping] - starts[overlapping])
+            for i, duration in zip(overlapping.tolist(), fixed_durations.tolist()):
+                transcript[i]['duration'] = duration
 
         # Save transcript as JSON
         transcript_file = os.path.join(output_dir, f"{video_id}_transcript.json")
-        with open(transcript_file, 'w', encoding='utf-8') as f:
-            json.dump(transcript, f, ensure_ascii=False, indent=4)
+        with open(transcript_file, 'wb') as f:
+            f.write(orjson.dumps(transcript, option=orjson.OPT_INDENT_2))
         
         # Also save as plain text for easy reading
         text_file = os.path.join(output_dir, f"{video_id}_transcript.txt")
         with open(text_file, 'w', encoding='utf-8') as f:
-            for entry in transcript:
-                f.write(f"[{entry['start']:.2f}s - {entry['start'] + entry['duration']:.2f}s] {entry['text']}\n")
+            f.write("".join(f"[{entry['start']:.2f}s - {entry['start'] + entry['duration']:.2f}s] {entry['text']}\n"
+                            for entry in transcript))
         
         return transcript_file
         
@@ -177,11 +197,16 @@ def main():
         # Download both by default
         print(f"Downloading audio and transcript for: {args.url}")
         
-        audio_file = download_audio(args.url, args.output_dir, args.force)
+        # The audio and the transcript come from different services and share no state,
+        # so fetch them at the same time
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            audio_future = executor.submit(download_audio, args.url, args.output_dir, args.force)
+            transcript_future = executor.submit(download_transcript, args.url, args.output_dir, args.force)
+            audio_file, transcript_file = audio_future.result(), transcript_future.result()
+        
         if audio_file:
             print(f"Audio saved to: {audio_file}")
         
-        transcript_file = download_transcript(args.url, args.output_dir, args.force)
         if transcript_file:
             print(f"Transcript saved to: {transcript_file}")
     